@@ -5,19 +5,72 @@ A unified PHP SAST orchestrator using Psalm, Semgrep, and ProgPilot
 Version: 0.2.0
 """
 import argparse
+import functools
+import hashlib
+import io
 import subprocess
 import os
+import re
 import sys
 import json
 import logging
-import re
+import stat
+import tempfile
+import threading
+import time
+from collections import Counter
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+# Optional speedups. PHALANX keeps working without them, so no Python
+# packages are required:
+#  - orjson parses/serializes several times faster than stdlib json
+#  - ijson streams findings out of scanner stdout instead of buffering it
+#    (only used without orjson, which parses the buffered document faster)
+#  - the docker SDK reuses one daemon connection instead of spawning a
+#    docker CLI process (and a new socket connection) per call; imported
+#    lazily by get_docker_client() since it pulls in requests/urllib3
+#    (~150 ms), which --help, --version and an invalid target shouldn't pay
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on host environment
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - depends on host environment
+    ijson = None
+
+docker: Any = None
+
+# Errors raised by docker SDK calls (API/daemon errors and HTTP transport);
+# filled in by get_docker_client() once the SDK is imported
+DOCKER_SDK_ERRORS: Tuple[Type[BaseException], ...] = ()
+
+# Invalid JSON (stdlib, orjson or ijson) or undecodable bytes
+JSON_ERRORS: Tuple[Type[BaseException], ...] = (ValueError,) + ((ijson.JSONError,) if ijson is not None else ())
 
 __version__ = "0.2.0"
 IMAGE_NAME = "phalanx"
 
+# Files baked into the image; a change to any of them forces a rebuild.
+# Their SHA-256 is stored on the image under IMAGE_CONTEXT_LABEL
+IMAGE_CONTEXT_FILES = ("Dockerfile", "progpilot_wrapper.php", "phalanx_run.sh")
+IMAGE_CONTEXT_LABEL = "phalanx.context"
+
+# Subprocess launch invariant: on Linux, CPython 3.10+ starts children with
+# vfork(), avoiding a page-table copy of this interpreter per docker
+# invocation. Any of preexec_fn=, user=, group= or extra_groups= forces a
+# full fork(), so never pass them to the subprocess calls below.
+
+# phalanx-run stops each scanner after 5 minutes on its own, so one slow tool
+# only loses its own result; this outer limit on the whole scan container is
+# a backstop with slack for the output validation that follows
+SCAN_TIMEOUT = 360
+
 # Configure logging with security-conscious settings
 logging.basicConfig(
     level=logging.INFO,
@@ -35,8 +88,83 @@ SEV_MAP = {
     "critical": "critical"
 }
 
+# Semgrep reports its own upper-case severity levels
+SEMGREP_SEV_MAP = {
+    "ERROR": "high",
+    "WARNING": "medium",
+    "INFO": "low"
+}
+
+# Case-merged lookups: each scanner emits one consistent case, so the hot
+# path is a single dict hit with no per-finding lower()/upper() allocation;
+# only unusually cased values fall back to case-folding
+SEV_LOOKUP = {**SEV_MAP, **{sev.upper(): level for sev, level in SEV_MAP.items()}}
+SEMGREP_SEV_LOOKUP = {
+    **SEMGREP_SEV_MAP,
+    **{sev.lower(): level for sev, level in SEMGREP_SEV_MAP.items()}
+}
+
+# First non-whitespace character (same set as str.isspace), for clip_str()
+NON_SPACE = re.compile(r"\S")
+
+# Normalized severities, lowest first
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+def json_loads(data: bytes) -> Any:
+    """Parse JSON bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps(obj: Any) -> bytes:
+    """Serialize an object to indented UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+def write_report(out_path: str, data: bytes) -> None:
+    """
+    Write prebuilt report bytes via os.open/os.write, bypassing Python's
+    buffered file layer: one write() syscall per call that the kernel
+    accepts in full (loops on partial writes). Raises OSError on failure.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+    fd = os.open(out_path, flags, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+@functools.lru_cache(maxsize=None)
+def get_docker_client() -> Any:
+    """
+    Return a docker SDK client connected to the daemon, or None when the SDK
+    is not installed or cannot reach the daemon (the docker CLI is used then).
+    Imports the SDK on first call.
+    """
+    global docker, DOCKER_SDK_ERRORS
+    try:
+        import docker
+        import docker.errors
+        import docker.types
+        import requests
+    except ImportError:
+        return None
+    DOCKER_SDK_ERRORS = (docker.errors.DockerException, requests.RequestException)
+    try:
+        client = docker.from_env(timeout=SCAN_TIMEOUT + 60)  # Outlasts the scan timeout
+        client.ping()
+        return client
+    except DOCKER_SDK_ERRORS as e:
+        logger.debug(f"Docker SDK cannot reach the daemon, using docker CLI: {e}")
+        return None
+
 def validate_docker_installed() -> bool:
     """Check if Docker is installed and accessible."""
+    if get_docker_client() is not None:
+        return True
     try:
         subprocess.run(
             ["docker", "--version"],
@@ -56,11 +184,13 @@ def validate_path(path: str) -> Tuple[bool, str]:
     """
     try:
         abs_path = os.path.abspath(path)
-        # Ensure path exists and is a directory
-        if not os.path.exists(abs_path):
+        # One stat() answers both "exists" and "is a directory"
+        try:
+            st = os.stat(abs_path)
+        except (FileNotFoundError, NotADirectoryError):
             logger.error(f"Path does not exist: {abs_path}")
             return False, ""
-        if not os.path.isdir(abs_path):
+        if not stat.S_ISDIR(st.st_mode):
             logger.error(f"Path is not a directory: {abs_path}")
             return False, ""
         # Check if path is readable
@@ -82,9 +212,14 @@ def sanitize_output_path(output_path: str) -> Tuple[bool, str]:
         parent_dir = os.path.dirname(abs_path)
 
         # Ensure parent directory exists and is writable
-        if not os.path.exists(parent_dir):
+        try:
+            st = os.stat(parent_dir)
+        except (FileNotFoundError, NotADirectoryError):
             logger.error(f"Output directory does not exist: {parent_dir}")
             return False, ""
+        if not stat.S_ISDIR(st.st_mode):
+            logger.error(f"Output directory is not a directory: {parent_dir}")
+            return False, ""
         if not os.access(parent_dir, os.W_OK):
             logger.error(f"Output directory is not writable: {parent_dir}")
             return False, ""
@@ -99,137 +234,436 @@ def sanitize_output_path(output_path: str) -> Tuple[bool, str]:
         logger.error(f"Output path validation error: {e}")
         return False, ""
 
+def image_context_digest(dockerfile_dir: str) -> Optional[str]:
+    """
+    Return the SHA-256 of the image build context (IMAGE_CONTEXT_FILES), or
+    None if the context cannot be read.
+    """
+    digest = hashlib.sha256()
+    try:
+        for name in IMAGE_CONTEXT_FILES:
+            with open(os.path.join(dockerfile_dir, name), "rb") as fd:
+                digest.update(fd.read())
+    except OSError as e:
+        logger.debug(f"Cannot hash Docker build context, skipping staleness check: {e}")
+        return None
+    return digest.hexdigest()
+
+def build_image_sdk(client: Any, dockerfile_dir: str, labels: Dict[str, str]) -> None:
+    """
+    docker SDK counterpart of ``docker build``: streams the build log to
+    stderr as it arrives and holds the whole build to the same 10 minute
+    limit (the client's timeout only bounds each read). Raises
+    docker.errors.BuildError on failure or timeout.
+    """
+    deadline = time.monotonic() + 600  # 10 minute timeout for building
+    for chunk in client.api.build(
+        path=dockerfile_dir, tag=IMAGE_NAME, labels=labels, rm=True, decode=True
+    ):
+        if "error" in chunk:
+            raise docker.errors.BuildError(chunk["error"], [])
+        line = chunk.get("stream") or (chunk["status"] + "\n" if chunk.get("status") else "")
+        if line:
+            sys.stderr.write(line)
+            sys.stderr.flush()
+        if time.monotonic() > deadline:
+            raise docker.errors.BuildError("build timed out after 10 minutes", [])
+
 def ensure_image(dockerfile_dir: str) -> bool:
-    """Build the Docker image if it doesn't already exist."""
+    """
+    Build the Docker image if it doesn't exist or is stale.
+    Builds are labelled with the build context's SHA-256 (IMAGE_CONTEXT_LABEL);
+    an image whose label is missing or differs predates the current
+    Dockerfile, wrapper or orchestrator and is rebuilt.
+    """
+    digest = image_context_digest(dockerfile_dir)
+    client = get_docker_client()
     try:
-        result = subprocess.run(
-            ["docker", "images", "-q", IMAGE_NAME],
-            capture_output=True,
-            text=True,
-            timeout=30,
-            check=True
-        )
-        existing = result.stdout.strip()
-    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        if client is not None:
+            try:
+                labels = client.images.get(IMAGE_NAME).labels
+                existing = True
+            except docker.errors.ImageNotFound:
+                labels, existing = None, False
+        else:
+            # Exits non-zero when the image doesn't exist
+            result = subprocess.run(
+                ["docker", "image", "inspect", "--format", "{{json .Config.Labels}}", IMAGE_NAME],
+                capture_output=True,
+                timeout=30,
+                check=False
+            )
+            existing = result.returncode == 0
+            labels = json_loads(result.stdout) if existing else None
+    except (subprocess.TimeoutExpired,) + JSON_ERRORS + DOCKER_SDK_ERRORS as e:
         logger.error(f"Failed to check for existing Docker image: {e}")
         return False
 
+    if existing and digest is not None and (labels or {}).get(IMAGE_CONTEXT_LABEL) != digest:
+        logger.info("Build context changed since the image was built, rebuilding")
+        existing = False
+
     if not existing:
         logger.info(f"Building Docker image '{IMAGE_NAME}'...")
+        build_labels = {IMAGE_CONTEXT_LABEL: digest} if digest is not None else {}
         try:
-            subprocess.run(
-                ["docker", "build", "-t", IMAGE_NAME, dockerfile_dir],
-                check=True,
-                timeout=600  # 10 minute timeout for building
-            )
+            if client is not None:
+                build_image_sdk(client, dockerfile_dir, build_labels)
+            else:
+                label_args = [f"--label={key}={value}" for key, value in build_labels.items()]
+                subprocess.run(
+                    ["docker", "build", *label_args, "-t", IMAGE_NAME, dockerfile_dir],
+                    check=True,
+                    timeout=600  # 10 minute timeout for building
+                )
             logger.info(f"Successfully built Docker image '{IMAGE_NAME}'")
-            return True
-        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) + DOCKER_SDK_ERRORS as e:
             logger.error(f"Failed to build Docker image: {e}")
             return False
 
     return True
 
-def run_tool(cmd: List[str], tool_name: str) -> str:
+def bind_mount_args(source: str, target: str) -> List[str]:
     """
-    Run a command safely with timeout and error handling.
-    Returns stdout as string or empty JSON object on error.
+    Build docker arguments for a read-only bind mount of ``source``.
+    Docker Desktop (macOS) gets the ``cached`` consistency flag so scanners
+    read through the host page cache instead of strictly coherent file
+    sharing; elsewhere an explicit private, read-only ``--mount`` is used.
     """
+    if sys.platform == "darwin":
+        return ["-v", f"{source}:{target}:ro,cached"]
+    # --mount takes CSV: quote the source field if the path contains , or "
+    source_field = f"source={source}"
+    if "," in source_field or '"' in source_field:
+        source_field = '"' + source_field.replace('"', '""') + '"'
+    return [
+        "--mount",
+        f"type=bind,{source_field},target={target},readonly,bind-propagation=private"
+    ]
+
+def bind_mount_sdk(source: str, target: str) -> Any:
+    """docker SDK equivalent of bind_mount_args()."""
+    if sys.platform == "darwin":
+        return docker.types.Mount(target, source, type="bind", read_only=True, consistency="cached")
+    return docker.types.Mount(target, source, type="bind", read_only=True, propagation="private")
+
+def kill_scan_container(container_name: str) -> None:
+    """Kill a running scan container (it was started with --rm)."""
     try:
-        logger.debug(f"Running command: {' '.join(cmd)}")
-        result = subprocess.run(
-            cmd,
+        subprocess.run(
+            ["docker", "kill", container_name],
             capture_output=True,
             text=True,
-            timeout=300,  # 5 minute timeout per tool
-            check=False  # Don't raise on non-zero exit
+            timeout=30,
+            check=False
         )
+    except (subprocess.TimeoutExpired, FileNotFoundError) as e:
+        logger.warning(f"Failed to stop scan container {container_name}: {e}")
+
+def iter_json_items(stream: IO[bytes], item_paths: Dict[str, str]) -> Iterator[Tuple[str, Any]]:
+    """
+    Parse ``stream`` in one pass and yield ``(key, item)`` for every element
+    of the JSON arrays at ``item_paths`` (key -> dotted path, e.g.
+    ``{"psalm": "psalm.issues"}``).
+    With orjson (or without ijson) the document is buffered and parsed in
+    one C call: phalanx-run prints nothing until every scanner finishes, so
+    streaming has no latency to win and ijson's per-event item rebuilding is
+    several times slower. Otherwise ijson holds only one item in memory at
+    a time.
+    """
+    if orjson is not None or ijson is None:
+        data = json_loads(stream.read() or b"{}")
+        for key, path in item_paths.items():
+            node = data
+            for part in path.split("."):
+                node = node.get(part) if isinstance(node, dict) else None
+            if isinstance(node, list):
+                for item in node:
+                    yield key, item
+        return
+
+    item_keys = {f"{path}.item": key for key, path in item_paths.items()}
+    events = ijson.parse(stream, use_float=True)
+    for prefix, event, value in events:
+        key = item_keys.get(prefix)
+        if key is None:
+            continue
+        if event not in ("start_map", "start_array"):
+            yield key, value
+            continue
+        # Rebuild this one item from its events
+        builder = ijson.ObjectBuilder()
+        builder.event(event, value)
+        depth = 1
+        for _, event, value in events:
+            builder.event(event, value)
+            if event in ("start_map", "start_array"):
+                depth += 1
+            elif event in ("end_map", "end_array"):
+                depth -= 1
+                if depth == 0:
+                    break
+        yield key, builder.value
+
+def run_tool(
+    cmd: List[str],
+    tool_name: str,
+    item_paths: Dict[str, str],
+    on_timeout: Optional[Callable[[], None]] = None
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Run a command safely with timeout and error handling.
+    Streams ``(key, item)`` pairs from the command's JSON stdout as they
+    arrive (see iter_json_items), so memory stays bounded by a single
+    finding when ijson is installed without orjson. ``on_timeout`` runs after the command
+    is killed for exceeding the limit. Yields nothing on error.
+    """
+    logger.debug(f"Running command: {' '.join(cmd)}")
+    timed_out = threading.Event()
 
-        if result.returncode != 0 and result.stderr:
-            logger.warning(f"{tool_name} completed with warnings/errors: {result.stderr[:200]}")
+    def kill_on_timeout() -> None:
+        timed_out.set()
+        proc.kill()
+        if on_timeout is not None:
+            on_timeout()
 
-        return result.stdout or "{}"
-    except subprocess.TimeoutExpired:
-        logger.error(f"{tool_name} execution timed out after 5 minutes")
-        return "{}"
+    try:
+        with tempfile.TemporaryFile() as stderr_fd:
+            # No preexec_fn: keeps the vfork() fast path (see the launch invariant above)
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_fd)
+            timer = threading.Timer(SCAN_TIMEOUT, kill_on_timeout)
+            timer.start()
+            try:
+                yield from iter_json_items(proc.stdout, item_paths)
+            except JSON_ERRORS:
+                if not timed_out.is_set():
+                    logger.warning(f"{tool_name} output is not valid JSON, findings may be incomplete")
+            finally:
+                timer.cancel()
+                proc.stdout.close()
+                if proc.poll() is None:
+                    proc.kill()
+                proc.wait()
+
+            if timed_out.is_set():
+                logger.error(f"{tool_name} execution timed out after {SCAN_TIMEOUT} seconds")
+            elif proc.returncode != 0:
+                stderr_fd.seek(0)
+                stderr = stderr_fd.read(200).decode("utf-8", errors="replace")
+                if stderr:
+                    logger.warning(f"{tool_name} completed with warnings/errors: {stderr}")
     except Exception as e:
         logger.error(f"Error running {tool_name}: {e}")
-        return "{}"
 
-def normalize_psalm(data: Dict) -> List[Dict]:
+class ChunkStream(io.RawIOBase):
+    """Read-only binary file over an iterator of bytes chunks (docker SDK log streams)."""
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        super().__init__()
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+def run_tool_sdk(
+    client: Any,
+    run_kwargs: Dict[str, Any],
+    tool_name: str,
+    item_paths: Dict[str, str]
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Docker SDK counterpart of run_tool(): starts the container detached over
+    the client's persistent daemon connection and streams its stdout log
+    into iter_json_items. Same SCAN_TIMEOUT and error reporting; the
+    container is always removed afterwards. Yields nothing on error.
+    """
+    logger.debug(f"Running container via Docker SDK: {run_kwargs.get('command')}")
+    timed_out = threading.Event()
+    container = None
+    try:
+        container = client.containers.run(detach=True, **run_kwargs)
+
+        def kill_on_timeout() -> None:
+            timed_out.set()
+            try:
+                container.kill()
+            except DOCKER_SDK_ERRORS:
+                pass
+
+        timer = threading.Timer(SCAN_TIMEOUT, kill_on_timeout)
+        timer.start()
+        try:
+            logs = container.logs(stdout=True, stderr=False, stream=True, follow=True)
+            yield from iter_json_items(io.BufferedReader(ChunkStream(logs)), item_paths)
+        except JSON_ERRORS:
+            if not timed_out.is_set():
+                logger.warning(f"{tool_name} output is not valid JSON, findings may be incomplete")
+        finally:
+            timer.cancel()
+
+        status = container.wait(timeout=30).get("StatusCode", 0)
+        if timed_out.is_set():
+            logger.error(f"{tool_name} execution timed out after {SCAN_TIMEOUT} seconds")
+        elif status != 0:
+            stderr = container.logs(stdout=False, stderr=True)[:200].decode("utf-8", errors="replace")
+            if stderr:
+                logger.warning(f"{tool_name} completed with warnings/errors: {stderr}")
+    except Exception as e:
+        logger.error(f"Error running {tool_name}: {e}")
+    finally:
+        if container is not None:
+            try:
+                container.remove(force=True)
+            except DOCKER_SDK_ERRORS:
+                pass
+
+def clip_str(value: Any, limit: int, strip: bool = False) -> str:
+    """
+    Return a scanner field as a string of at most ``limit`` characters.
+    Strings are sliced directly rather than copied through str() first, so
+    oversized snippets cost O(limit); None becomes "". With ``strip`` the
+    result equals ``str(value).strip()[:limit]`` without a full-length copy.
+    """
+    if not isinstance(value, str):
+        if value is None:
+            return ""
+        value = str(value)
+    if not strip:
+        return value[:limit]
+    match = NON_SPACE.search(value)
+    start = match.start() if match else len(value)
+    end = start + limit
+    clipped = value[start:end]
+    # Trailing whitespace is only stripped when nothing but whitespace follows
+    if clipped[-1:].isspace() and NON_SPACE.search(value, end) is None:
+        clipped = clipped.rstrip()
+    return clipped
+
+def normalize_psalm(issues: Iterable[Dict]) -> Iterator[Dict]:
     """Normalize Psalm output to standard format."""
-    findings = []
+    sev_get = SEV_LOOKUP.get
+    lower = str.lower
     try:
-        for issue in data.get("issues", []):
-            sev = issue.get("severity", "").lower()
-            findings.append({
+        for issue in issues:
+            get = issue.get
+            sev = get("severity") or ""
+            yield {
                 "tool": "psalm",
-                "title": str(issue.get("message", ""))[:500],  # Limit title length
-                "file": str(issue.get("file_name", ""))[:1000],
-                "line": int(issue.get("line_from", 0)),
-                "severity": SEV_MAP.get(sev, "medium"),
-                "code": str(issue.get("snippet", "")).strip()[:1000],
+                "title": clip_str(get("message"), 500),  # Limit title length
+                "file": clip_str(get("file_name"), 1000),
+                "line": int(get("line_from") or 0),
+                "severity": sev_get(sev) or sev_get(lower(sev), "medium"),
+                "code": clip_str(get("snippet"), 1000, strip=True),
                 "metadata": {
-                    "type": str(issue.get("type", ""))[:100],
-                    "link": str(issue.get("link", ""))[:500]
+                    "type": clip_str(get("type"), 100),
+                    "link": clip_str(get("link"), 500)
                 }
-            })
+            }
     except Exception as e:
         logger.error(f"Error normalizing Psalm output: {e}")
-    return findings
 
-def normalize_semgrep(data: Dict) -> List[Dict]:
+def normalize_semgrep(results: Iterable[Dict]) -> Iterator[Dict]:
     """Normalize Semgrep output to standard format."""
-    findings = []
+    sev_get = SEMGREP_SEV_LOOKUP.get
+    upper = str.upper
     try:
         # Semgrep JSON format: {"results": [...], "errors": [...]}
-        for result in data.get("results", []):
+        for result in results:
+            get = result.get
+            extra = get("extra") or {}
+            extra_get = extra.get
+
             # Map Semgrep severity to our standard levels
-            sev = result.get("extra", {}).get("severity", "WARNING").upper()
-            sev_map = {
-                "ERROR": "high",
-                "WARNING": "medium",
-                "INFO": "low"
-            }
+            sev = extra_get("severity") or "WARNING"
 
             # Get check metadata
-            check_id = result.get("check_id", "")
-            message = result.get("extra", {}).get("message", "")
+            check_id = get("check_id") or ""
+            message = extra_get("message") or ""
 
-            findings.append({
+            yield {
                 "tool": "semgrep",
-                "title": str(message)[:500] if message else str(check_id)[:500],
-                "file": str(result.get("path", ""))[:1000],
-                "line": int(result.get("start", {}).get("line", 0)),
-                "severity": sev_map.get(sev, "medium"),
-                "code": str(result.get("extra", {}).get("lines", ""))[:1000],
+                "title": clip_str(message or check_id, 500),
+                "file": clip_str(get("path"), 1000),
+                "line": int((get("start") or {}).get("line") or 0),
+                "severity": sev_get(sev) or sev_get(upper(sev), "medium"),
+                "code": clip_str(extra_get("lines"), 1000),
                 "metadata": {
-                    "rule": str(check_id)[:100],
-                    "confidence": str(result.get("extra", {}).get("metadata", {}).get("confidence", ""))[:50]
+                    "rule": clip_str(check_id, 100),
+                    "confidence": clip_str((extra_get("metadata") or {}).get("confidence"), 50)
                 }
-            })
+            }
     except Exception as e:
         logger.error(f"Error normalizing Semgrep output: {e}")
-    return findings
 
-def normalize_progpilot(data: Dict) -> List[Dict]:
+def normalize_progpilot(results: Iterable[Dict]) -> Iterator[Dict]:
     """Normalize ProgPilot output to standard format."""
-    findings = []
+    sev_get = SEV_LOOKUP.get
+    lower = str.lower
     try:
-        for issue in data.get("results", []):
-            sev = issue.get("severity", "medium").lower()
-            findings.append({
+        for issue in results:
+            get = issue.get
+            sev = get("severity") or "medium"
+            yield {
                 "tool": "progpilot",
-                "title": str(issue.get("description") or issue.get("message", ""))[:500],
-                "file": str(issue.get("file", ""))[:1000],
-                "line": int(issue.get("line", 0)),
-                "severity": SEV_MAP.get(sev, "medium"),
-                "code": str(issue.get("code", ""))[:1000],
-                "metadata": {"rule": str(issue.get("rule_name", ""))[:100]}
-            })
+                "title": clip_str(get("description") or get("message"), 500),
+                "file": clip_str(get("file"), 1000),
+                "line": int(get("line") or 0),
+                "severity": sev_get(sev) or sev_get(lower(sev), "medium"),
+                "code": clip_str(get("code"), 1000),
+                "metadata": {"rule": clip_str(get("rule_name"), 100)}
+            }
     except Exception as e:
         logger.error(f"Error normalizing ProgPilot output: {e}")
-    return findings
+
+def deduplicate_findings(findings: Iterable[Dict]) -> List[Dict]:
+    """
+    Collapse findings reported by several tools for the same file, line and
+    title into one entry. Each unique finding gets a ``tools`` list of every
+    tool that reported it and keeps the highest severity among them.
+    Findings from the same tool are never merged with each other, so distinct
+    rules that share a message and line keep their own code and metadata.
+    """
+    unique: List[Dict] = []
+    first_seen: Dict[Tuple[str, int, str], Dict] = {}
+    for finding in findings:
+        file_path = finding["file"]
+        # Psalm reports paths relative to /app; ProgPilot sees the same
+        # mount at /workspace
+        if file_path.startswith("/workspace/"):
+            file_path = "/app/" + file_path[len("/workspace/"):]
+        elif not file_path.startswith("/"):
+            file_path = "/app/" + file_path
+        key = (file_path, finding["line"], finding["title"])
+        seen = first_seen.get(key)
+        if seen is not None and finding["tool"] not in seen["tools"]:
+            seen["tools"].append(finding["tool"])
+            if SEVERITY_RANK[finding["severity"]] > SEVERITY_RANK[seen["severity"]]:
+                seen["severity"] = finding["severity"]
+            continue
+        finding["tools"] = [finding["tool"]]
+        unique.append(finding)
+        if seen is None:
+            first_seen[key] = finding
+    return unique
+
+# Key in phalanx-run's combined output -> (findings array key, normalizer)
+SCANNERS: Dict[str, Tuple[str, Callable[[Iterable[Dict]], Iterator[Dict]]]] = {
+    "psalm": ("issues", normalize_psalm),
+    "semgrep": ("results", normalize_semgrep),
+    "progpilot": ("results", normalize_progpilot),
+}
 
 def main() -> int:
     """Main entry point for PHALANX."""
@@ -256,6 +690,11 @@ def main() -> int:
         action="store_true",
         help="Enable verbose logging"
     )
+    parser.add_argument(
+        "--print-json",
+        action="store_true",
+        help="Print the full JSON report to stdout instead of the summary"
+    )
 
     args = parser.parse_args()
 
@@ -264,12 +703,8 @@ def main() -> int:
 
     logger.info(f"PHALANX v{__version__} - PHP Security Analysis Tool")
 
-    # Validate Docker installation
-    if not validate_docker_installed():
-        logger.error("Docker is required but not found. Please install Docker and try again.")
-        return 1
-
-    # Validate target directory
+    # Validate target directory first: it's cheap, and a bad path shouldn't
+    # pay for the docker SDK import and daemon ping
     is_valid, target_dir = validate_path(args.target)
     if not is_valid:
         logger.error(f"Invalid target directory: {args.target}")
@@ -277,6 +712,11 @@ def main() -> int:
 
     logger.info(f"Target directory: {target_dir}")
 
+    # Validate Docker installation
+    if not validate_docker_installed():
+        logger.error("Docker is required but not found. Please install Docker and try again.")
+        return 1
+
     # Determine Dockerfile location (script's directory)
     docker_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -285,79 +725,74 @@ def main() -> int:
         logger.error("Failed to build or find Docker image")
         return 1
 
-    # Run each security tool in its container
-    logger.info("Running Psalm v7 security scanner...")
-    psalm_cmd = [
-        "docker", "run", "--rm",
-        "--security-opt=no-new-privileges",
-        "--cap-drop=ALL",
-        "-v", f"{target_dir}:/app:ro",
-        IMAGE_NAME,
-        "sh", "-c", "cd /app && (psalm --init --level=1 2>/dev/null || true) && psalm --output-format=json --no-cache ."
-    ]
-    psalm_out = run_tool(psalm_cmd, "Psalm")
-
-    try:
-        psalm_json = json.loads(psalm_out)
-    except json.JSONDecodeError:
-        logger.warning("Psalm output is not valid JSON, using empty result")
-        psalm_json = {}
-
-    logger.info("Running Semgrep security scanner...")
-    semgrep_cmd = [
-        "docker", "run", "--rm",
-        "--security-opt=no-new-privileges",
-        "--cap-drop=ALL",
-        "-v", f"{target_dir}:/app:ro",
-        IMAGE_NAME,
-        "semgrep", "--config=auto", "--json", "/app"
-    ]
-    semgrep_out = run_tool(semgrep_cmd, "Semgrep")
-
-    try:
-        semgrep_json = json.loads(semgrep_out)
-    except json.JSONDecodeError:
-        logger.warning("Semgrep output is not valid JSON, using empty result")
-        semgrep_json = {}
-
-    logger.info("Running ProgPilot security scanner...")
-    prog_cmd = [
-        "docker", "run", "--rm",
-        "--security-opt=no-new-privileges",
-        "--cap-drop=ALL",
-        "-v", f"{target_dir}:/workspace:ro",
-        IMAGE_NAME,
-        "php", "/home/phalanx/progpilot_wrapper.php", "/workspace"
-    ]
-    prog_out = run_tool(prog_cmd, "ProgPilot")
+    # One container runs all three scanners concurrently (phalanx-run) and
+    # emits a single combined JSON document that is streamed into the normalizers
+    container_name = f"phalanx-scan-{os.urandom(6).hex()}"
+    item_paths = {tool: f"{tool}.{items_key}" for tool, (items_key, _) in SCANNERS.items()}
+
+    logger.info("Running Psalm, Semgrep and ProgPilot security scanners...")
+    client = get_docker_client()
+    if client is not None:
+        items = run_tool_sdk(
+            client,
+            {
+                "image": IMAGE_NAME,
+                "command": ["phalanx-run"],
+                "name": container_name,
+                "security_opt": ["no-new-privileges"],
+                "cap_drop": ["ALL"],
+                # Output is read back through the logs API, so pin a driver
+                # that supports it whatever the daemon's default log driver is
+                "log_config": docker.types.LogConfig(type=docker.types.LogConfig.types.JSON),
+                "mounts": [
+                    bind_mount_sdk(target_dir, "/app"),
+                    bind_mount_sdk(target_dir, "/workspace"),
+                ],
+            },
+            "Scanners",
+            item_paths
+        )
+    else:
+        scan_cmd = [
+            "docker", "run", "--rm",
+            "--name", container_name,
+            "--security-opt=no-new-privileges",
+            "--cap-drop=ALL",
+            *bind_mount_args(target_dir, "/app"),
+            *bind_mount_args(target_dir, "/workspace"),
+            IMAGE_NAME,
+            "phalanx-run"
+        ]
+        items = run_tool(
+            scan_cmd,
+            "Scanners",
+            item_paths,
+            on_timeout=lambda: kill_scan_container(container_name)
+        )
+    # phalanx-run emits each tool's findings contiguously, in SCANNERS order.
+    # Chaining the normalizer generators straight into deduplication builds
+    # a single list instead of per-tool lists that are then copied together
+    all_findings = deduplicate_findings(chain.from_iterable(
+        SCANNERS[tool][1](item for _, item in tool_items)
+        for tool, tool_items in groupby(items, key=itemgetter(0))
+    ))
+
+    # Build summary statistics. Counter counts iterables in C, and feeding it
+    # map/itemgetter/chain keeps the whole tally in C with no per-finding
+    # Python frame. by_tool counts every tool that reported a finding, so it
+    # may sum past total_findings; by_severity is seeded with all four levels
+    by_tool = Counter(chain.from_iterable(map(itemgetter("tools"), all_findings)))
+    by_severity = Counter(dict.fromkeys(SEVERITY_RANK, 0))
+    by_severity.update(map(itemgetter("severity"), all_findings))
 
-    try:
-        prog_json = json.loads(prog_out)
-    except json.JSONDecodeError:
-        logger.warning("ProgPilot output is not valid JSON, using empty result")
-        prog_json = {}
-
-    # Normalize all findings
-    all_findings = []
-    all_findings.extend(normalize_psalm(psalm_json))
-    all_findings.extend(normalize_semgrep(semgrep_json))
-    all_findings.extend(normalize_progpilot(prog_json))
-
-    # Build summary statistics
     summary = {
         "total_findings": len(all_findings),
-        "by_tool": {},
-        "by_severity": {"low": 0, "medium": 0, "high": 0, "critical": 0},
+        "by_tool": {tool: by_tool[tool] for tool in SCANNERS if tool in by_tool},
+        "by_severity": dict(by_severity),
         "scan_timestamp": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
         "phalanx_version": __version__
     }
 
-    for finding in all_findings:
-        tool = finding.get("tool", "unknown")
-        severity = finding.get("severity", "medium")
-        summary["by_tool"][tool] = summary["by_tool"].get(tool, 0) + 1
-        summary["by_severity"][severity] = summary["by_severity"].get(severity, 0) + 1
-
     report = {
         "summary": summary,
         "findings": all_findings
@@ -371,18 +806,23 @@ def main() -> int:
             return 1
     else:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        default_name = f"PHALANX_output-{timestamp}.json"
-        out_path = os.path.join(os.getcwd(), default_name)
+        out_path = str(Path.cwd() / f"PHALANX_output-{timestamp}.json")
+
+    # Serialize once; the same bytes go to the file and, if requested, stdout
+    report_bytes = json_dumps(report)
 
     # Write report to file
     try:
-        with open(out_path, "w", encoding="utf-8") as fd:
-            json.dump(report, fd, indent=2, ensure_ascii=False)
+        write_report(out_path, report_bytes)
         logger.info(f"Combined report written to: {out_path}")
     except IOError as e:
         logger.error(f"Failed to write report file: {e}")
         return 1
 
+    if args.print_json:
+        sys.stdout.buffer.write(report_bytes + b"\n")
+        return 0
+
     # Display summary to stdout
     print("\n" + "="*60)
     print(f"PHALANX v{__version__} - Scan Complete")
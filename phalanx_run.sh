@@ -0,0 +1,64 @@
+#!/bin/sh
+# phalanx-run: In-container scan orchestrator for PHALANX
+# Runs Psalm, Semgrep and ProgPilot concurrently and prints one combined
+# JSON document so phalanx.py needs a single docker run and a single parse:
+#   {"psalm": {...}, "semgrep": {...}, "progpilot": {...}}
+# Expects the target mounted read-only at /app and /workspace.
+
+out_dir=$(mktemp -d) || exit 1
+trap 'rm -rf "$out_dir"' EXIT
+
+# Each scanner gets its own 5 minute budget; one that runs over is killed
+# (SIGKILL 10s after SIGTERM) and falls back to {} without losing the others
+tool_timeout=300
+
+# Run a scanner under the per-tool timeout: run <Name> <output file> <command...>
+run() {
+    name=$1 out=$2
+    shift 2
+    timeout -k 10 "$tool_timeout" "$@" > "$out"
+    rc=$?
+    if [ "$rc" -eq 124 ] || [ "$rc" -eq 137 ]; then
+        echo "phalanx-run: $name timed out after ${tool_timeout}s" >&2
+    fi
+    return "$rc"
+}
+
+# psalm --init prints progress to stdout, keep it out of the JSON
+run Psalm "$out_dir/psalm.json" sh -c 'cd /app && (psalm --init --level=1 >/dev/null 2>&1 || true) \
+    && psalm --output-format=json --no-cache .' &
+psalm_pid=$!
+
+run Semgrep "$out_dir/semgrep.json" semgrep --config=auto --json /app &
+semgrep_pid=$!
+
+run ProgPilot "$out_dir/progpilot.json" php /home/phalanx/progpilot_wrapper.php /workspace &
+progpilot_pid=$!
+
+status=0
+wait "$psalm_pid" || status=1
+wait "$semgrep_pid" || status=1
+wait "$progpilot_pid" || status=1
+
+# Print a tool's output if it is valid JSON, otherwise an empty object,
+# so one broken scanner cannot corrupt the combined document
+# (no memory_limit: the image has no php.ini and the 128M default would
+# reject large but valid reports)
+emit() {
+    if [ -s "$2" ] && php -d memory_limit=-1 -r 'json_decode(file_get_contents($argv[1]), null, 4096); exit(json_last_error() === JSON_ERROR_NONE ? 0 : 1);' "$2"; then
+        cat "$2"
+    else
+        echo "phalanx-run: $1 output is not valid JSON, using empty result" >&2
+        printf '{}'
+    fi
+}
+
+printf '{"psalm":'
+emit Psalm "$out_dir/psalm.json"
+printf ',"semgrep":'
+emit Semgrep "$out_dir/semgrep.json"
+printf ',"progpilot":'
+emit ProgPilot "$out_dir/progpilot.json"
+printf '}\n'
+
+exit "$status"